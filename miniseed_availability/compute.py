@@ -9,18 +9,31 @@ Module containing methods for computing data availability.
 
 """
 
+import csv
+import functools
+import os
 import pathlib
-from datetime import datetime as dt
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime as dt, timedelta as td
+from fnmatch import fnmatch
 from itertools import chain
-from statistics import mean
 from typing import Generator
 
+import numpy as np
 import obspy
-import pandas as pd
+from obspy.io.mseed import ObsPyMSEEDError
 
 from .utils import SOURCE_CODES
 
 
+# Daily files follow the SDS naming convention, NET.STA.LOC.CHAN.D.YYYY.JJJ
+SDS_FILENAME = re.compile(r"[^.]+\.[^.]+\.[^.]*\.[^.]+\.D\.(\d{4})\.(\d{3})")
+
+# Data beginning after this time of day are treated as missing the start of the day
+LATE_START = obspy.UTCDateTime("2001-001").time.replace(minute=3)
+
+
 def peek(
     generator: Generator[pathlib.Path, None, None],
 ) -> Generator[pathlib.Path, None, None]:
@@ -45,7 +58,39 @@ def peek(
     return chain([first], generator)
 
 
-def evaluate_availability(station: str, file_: pathlib.Path) -> tuple[str, float]:
+def list_files(station_dir: str, channel: str) -> list[str]:
+    """
+    Lists the daily files for a station in a miniSEED archive, scanning directories
+    with os.scandir to reuse the file type information returned with each entry.
+
+    Parameters
+    ----------
+    station_dir: Path to the station directory for a given year in the archive.
+    channel: Channel code, which may contain shell-style wildcards (e.g. "*HZ").
+
+    Returns
+    -------
+    Sorted list of paths to the files for all matching channels.
+
+    """
+
+    files = []
+    try:
+        with os.scandir(station_dir) as channel_dirs:
+            for channel_dir in channel_dirs:
+                if not (
+                    fnmatch(channel_dir.name, f"{channel}.D") and channel_dir.is_dir()
+                ):
+                    continue
+                with os.scandir(channel_dir.path) as entries:
+                    files.extend(entry.path for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return []
+
+    return sorted(files)
+
+
+def evaluate_availability(station: str, file_: str) -> tuple[str, float]:
     """
     Checks the availability of a given station on a given date.
 
@@ -68,84 +113,109 @@ def evaluate_availability(station: str, file_: pathlib.Path) -> tuple[str, float
 
     """
 
-    date = "-".join(str(file_.name).split(".")[5:7])
-    date = dt.strptime(date, "%Y-%j")
+    year, jday = SDS_FILENAME.match(os.path.basename(file_)).groups()
+    date = dt(int(year), 1, 1) + td(days=int(jday) - 1)
 
     try:
-        st = obspy.read(file_, headonly=True)
+        st = obspy.read(file_, headonly=True, format="MSEED")
+
+        duration = sum(tr.stats.npts * tr.stats.delta for tr in st) / len(st)
 
-        midnight = obspy.UTCDateTime("2001-001").time
+        starts = np.array([tr.stats.starttime.timestamp for tr in st])
+        ends = np.array([tr.stats.endtime.timestamp for tr in st])
+        deltas = np.array([tr.stats.delta for tr in st])
+        order = np.lexsort((ends, starts))
+        starts, ends, deltas = starts[order], ends[order], deltas[order]
 
-        overlaps = st.get_gaps(max_gap=0.00001)
-        long_gaps = st.get_gaps(min_gap=181)
-        short_gaps = st.get_gaps(min_gap=0, max_gap=180)
+        # Gap lengths (negative for overlaps) in s between consecutive traces. As with
+        # Stream.get_gaps, overlaps are capped at the extent of the later trace and
+        # offsets of less than half a sample at a constant sampling rate are ignored
+        gaps = starts[1:] - ends[:-1] - deltas[:-1]
+        gaps = np.where(gaps < 0, np.maximum(gaps, starts[1:] - ends[1:]), gaps)
+        gaps = gaps[(np.abs(gaps) >= 0.5 * deltas[:-1]) | (deltas[1:] != deltas[:-1])]
+
+        overlaps = np.any(gaps <= 0.00001)
+        long_gaps = np.any(gaps >= 181)
+        short_gaps = np.any(gaps <= 180)
 
         if overlaps:
             score = 0.5
         elif long_gaps:
-            if mean([tr.stats.npts * tr.stats.delta for tr in st]) < 300:
+            if duration < 300:
                 score = 2.0
             elif short_gaps:
                 score = 1.5
             else:
                 score = 1.0
         elif short_gaps:
-            if mean([tr.stats.npts * tr.stats.delta for tr in st]) < 300:
+            if duration < 300:
                 score = 2.0
-            elif st.sort(keys=["starttime"])[0].stats.starttime.time > midnight.replace(
-                minute=3
-            ):
+            elif obspy.UTCDateTime(starts[0]).time > LATE_START:
                 score = 1.5
             else:
                 score = 2.5
-        elif mean([tr.stats.npts * tr.stats.delta for tr in st]) < 86400.0:
-            if mean([tr.stats.npts * tr.stats.delta for tr in st]) < 300:
+        elif duration < 86400.0:
+            if duration < 300:
                 score = 2.0
             else:
                 score = 1.0
         else:
             score = 3.0
-    except TypeError:
+    except (TypeError, ObsPyMSEEDError):
         score = 0.0
 
-    print(f"      ...{date}, score: {score}...")
-
-    return date.strftime("%Y-%m-%d"), score
+    return f"{date.year:04d}-{date.month:02d}-{date.day:02d}", score
 
 
 def compute_entrypoint(config: dict) -> None:
     """Entry point for the compute command-line utility."""
 
     source_code = SOURCE_CODES[config["channel"][1]]
+    archive = config["archive_path"]
+
+    with ProcessPoolExecutor(max_workers=config.get("n_workers")) as executor:
+        for year in config["years"]:
+            print(f"Evaluating availability for {year}...")
+            for station_id in config["stations"]:
+                print(f"   ...station {station_id}")
+                network, station = station_id.split(".")
+                files = list_files(
+                    os.path.join(archive, str(year), network, station),
+                    config["channel"],
+                )
+
+                outfile = (
+                    pathlib.Path(config["product_path"])
+                    / f"timeseries/{source_code}/availability"
+                    / f"{year}/{network}/{station}"
+                    / f"{station_id}.{year}.availability.csv"
+                )
 
-    for year in config["years"]:
-        print(f"Evaluating availability for {year}...")
-        for station_id in config["stations"]:
-            print(f"   ...station {station_id}")
-            network, station = station_id.split(".")
-            files = sorted(
-                pathlib.Path(config["archive_path"]).glob(
-                    f"{year}/{network}/{station}/{config['channel']}.D/*"
+                # Merge with any previous results, keyed by date, newest taking priority
+                availability = {}
+                if outfile.exists():
+                    with outfile.open(newline="") as f:
+                        reader = csv.reader(f)
+                        next(reader, None)
+                        availability.update(reader)
+
+                results = list(
+                    executor.map(
+                        functools.partial(evaluate_availability, station),
+                        files,
+                        chunksize=16,
+                    )
                 )
-            )
-
-            availability = [evaluate_availability(station, file_) for file_ in files]
-            availability_df = pd.DataFrame(
-                availability, columns=["Date", "Availability"]
-            )
-
-            outfile = (
-                pathlib.Path(config["product_path"])
-                / f"timeseries/{source_code}/availability"
-                / f"{year}/{network}/{station}"
-                / f"{station_id}.{year}.availability.csv"
-            )
-            outfile.parent.mkdir(parents=True, exist_ok=True)
-
-            if outfile.exists():
-                existing_availability_df = pd.read_csv(outfile)
-                availability_df = pd.concat([availability_df, existing_availability_df])
-                availability_df.drop_duplicates(subset="Date")
-
-            if not len(availability_df.index) == 0:
-                availability_df.to_csv(outfile, index=False)
+                availability.update(results)
+                if results:
+                    mean_score = sum(score for _, score in results) / len(results)
+                    print(
+                        f"      ...{len(results)} files, mean score: {mean_score:.2f}"
+                    )
+
+                if availability:
+                    outfile.parent.mkdir(parents=True, exist_ok=True)
+                    with outfile.open("w", newline="") as f:
+                        writer = csv.writer(f, lineterminator="\n")
+                        writer.writerow(["Date", "Availability"])
+                        writer.writerows(sorted(availability.items()))
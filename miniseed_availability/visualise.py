@@ -9,19 +9,68 @@ Module containing methods for visualising data availability.
 
 """
 
+import csv
 import itertools
 import pathlib
-from datetime import datetime as dt, timedelta as td
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
+from matplotlib.collections import LineCollection
 from matplotlib.ticker import NullFormatter
 
 from .utils import SOURCE_CODES
 
 
+# Bar (colour, linewidth) for each availability score, indexed by int(2 * score). A
+# colour of None indicates that the station colour is used.
+AVAILABILITY_STYLES = [
+    None,  # No data
+    ("red", 6),  # Overlapping data
+    (None, 4),  # Gappy data
+    ("black", 4),  # Gappy including transmission gaps
+    (None, 2),  # Event data
+    ("black", 6),  # Transmission gaps only
+    (None, 10),  # Full day, no gaps
+]
+
+
+def read_availability(availability_file: str) -> tuple[list[str], list[float]]:
+    """
+    Read the dates and availability scores from a computed availability file.
+
+    Parameters
+    ----------
+    availability_file:
+        Path to the availability CSV file for a given station and year.
+
+    Returns
+    -------
+    dates:
+        Dates, as YYYY-MM-DD, for which availability has been computed. Empty if the
+        file does not exist.
+    scores:
+        Availability score for each date.
+
+    """
+
+    dates, scores = [], []
+    try:
+        f = open(availability_file, newline="")
+    except FileNotFoundError:
+        return dates, scores
+    with f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for date, score in reader:
+            dates.append(date)
+            scores.append(float(score))
+
+    return dates, scores
+
+
 def plot_data_availability(
     product_dir: pathlib.Path, starttime: dt, endtime: dt, stations: list
 ) -> plt.Figure:
@@ -63,51 +112,51 @@ def plot_data_availability(
     colours = iter(
         plt.cm.Pastel2(np.linspace(0, len(stations), len(stations) + 1) % 8 / 8)
     )
-    for i, station_id in enumerate(stations):
+    # Reading the files is I/O bound, so is done concurrently across all stations and
+    # years. Drawing remains serial, as pyplot is not thread-safe.
+    base_dir = str(product_dir)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reads = []
+        for station_id in stations:
+            network, station = station_id.split(".")
+            reads.append(
+                executor.map(
+                    read_availability,
+                    [
+                        f"{base_dir}/{year}/{network}/{station}/"
+                        f"{station_id}.{year}.availability.csv"
+                        for year in range(starttime.year, endtime.year + 1, 1)
+                    ],
+                )
+            )
+        availability = [list(station_reads) for station_reads in reads]
+
+    for i, (station_id, station_availability) in enumerate(zip(stations, availability)):
         network, station = station_id.split(".")
         j = len(stations) - i
         colour = next(colours)
-        df = pd.DataFrame()
-        dfs = [
-            pd.read_csv(
-                product_dir
-                / f"{year}/{network}/{station}"
-                / f"{station_id}.{year}.availability.csv"
-            )
-            for year in range(starttime.year, endtime.year + 1, 1)
-            if (
-                product_dir
-                / f"{year}/{network}/{station}"
-                / f"{station_id}.{year}.availability.csv"
-            ).exists()
-        ]
-        df = pd.concat(dfs)
-
-        for _, row in df.iterrows():
-            date = dt.strptime(row.Date, "%Y-%m-%d")
-
-            match row.Availability:
-                case 0:
-                    continue
-                case 0.5:  # Overlapping data
-                    color, linewidth = "red", 6
-                case 1:  # Gappy data
-                    color, linewidth = colour, 4
-                case 1.5:  # Gappy including transmission gaps
-                    color, linewidth = "black", 4
-                case 2:  # Event data
-                    color, linewidth = colour, 2
-                case 2.5:  # Transmission gaps only
-                    color, linewidth = "black", 6
-                case 3:  # Full day, no gaps
-                    color, linewidth = colour, 10
-
-            ax.hlines(
-                j,
-                date,
-                date + td(days=1),
-                color=color,
-                linewidth=linewidth,
+        dates, scores = [], []
+        for year_dates, year_scores in station_availability:
+            dates.extend(year_dates)
+            scores.extend(year_scores)
+        starts = mdates.date2num(np.array(dates, dtype="datetime64[D]"))
+        codes = (np.array(scores) * 2).astype(int)
+
+        # Draw all days with the same availability score as a single collection
+        for code in np.unique(codes):
+            if AVAILABILITY_STYLES[code] is None:
+                continue
+            color, linewidth = AVAILABILITY_STYLES[code]
+            if color is None:
+                color = colour
+
+            start = starts[codes == code]
+            segments = np.stack(
+                [start, np.full_like(start, j), start + 1, np.full_like(start, j)],
+                axis=1,
+            ).reshape(-1, 2, 2)
+            ax.add_collection(
+                LineCollection(segments, colors=color, linewidths=linewidth)
             )
 
         labels.append(station)
@@ -178,6 +227,8 @@ def visualise_entrypoint(config: dict) -> None:
     plot_dir = pathlib.Path(config["product_path"]) / f"plots/{source_code}/availability"
     plot_dir.mkdir(parents=True, exist_ok=True)
 
-    plt.savefig(plot_dir / f"{config['filename']}.png", dpi=400, format="png")
+    fig.savefig(
+        plot_dir / f"{config['filename']}.png", dpi=config.get("dpi", 150), format="png"
+    )
 
-    plt.clf()
+    plt.close(fig)